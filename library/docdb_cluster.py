@@ -84,11 +84,22 @@ options:
   wait:
     description:
       - Whether or not to wait for the restored cluster to become available
+      - With state=absent, whether or not to wait for the cluster to be deleted
     default: false
   wait_timeout:
     description:
-      - Number of seconds to wait for the new cluster to become available before giving up
-    default: 600 when creating, 3600 when restoring from snapshot (yes an entire hour)
+      - Number of seconds to wait for the new cluster to become available (or to be deleted) before giving up
+    default: 600 when creating, 3600 when restoring from snapshot or deleting (yes an entire hour)
+  wait_delay:
+    description:
+      - Number of seconds to wait between polls while waiting for the cluster
+      - Capped at I(wait_timeout)
+    default: 15
+  wait_max_attempts:
+    description:
+      - Maximum number of polls while waiting for the cluster
+      - Defaults to I(wait_timeout) divided by I(wait_delay)
+    default: null
   final_db_cluster_snapshot_identifier:
     description:
       - The DB Cluster snapshot identifier of the new DB cluster snapshot created when skip_final_snapshot is false.
@@ -129,72 +140,152 @@ EXAMPLES = '''
     wait: yes
 '''
 
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.ec2 import boto3_conn, ec2_argument_spec, get_aws_connection_info
+
 try:
     import boto3
     import botocore.exceptions
+    import botocore.waiter
+    from botocore.config import Config
     HAS_BOTO3 = True
 except ImportError:
     HAS_BOTO3 = False
 
+import time
+
+# DocumentDB only ships instance waiters, so the cluster waiters are defined here
+CLUSTER_WAITERS = {
+    'version': 2,
+    'waiters': {
+        'DBClusterAvailable': {
+            'delay': 30,
+            'maxAttempts': 60,
+            'operation': 'DescribeDBClusters',
+            'acceptors': [
+                {'matcher': 'pathAll', 'argument': 'DBClusters[].Status', 'expected': 'available', 'state': 'success'},
+                {'matcher': 'pathAny', 'argument': 'DBClusters[].Status', 'expected': 'deleted', 'state': 'failure'},
+                {'matcher': 'pathAny', 'argument': 'DBClusters[].Status', 'expected': 'deleting', 'state': 'failure'},
+                {'matcher': 'pathAny', 'argument': 'DBClusters[].Status', 'expected': 'failed', 'state': 'failure'},
+            ],
+        },
+        'DBClusterDeleted': {
+            'delay': 30,
+            'maxAttempts': 60,
+            'operation': 'DescribeDBClusters',
+            'acceptors': [
+                {'matcher': 'path', 'argument': 'length(DBClusters) == `0`', 'expected': True, 'state': 'success'},
+                {'matcher': 'error', 'expected': 'DBClusterNotFoundFault', 'state': 'success'},
+                {'matcher': 'pathAny', 'argument': 'DBClusters[].Status', 'expected': 'creating', 'state': 'failure'},
+                {'matcher': 'pathAny', 'argument': 'DBClusters[].Status', 'expected': 'modifying', 'state': 'failure'},
+                {'matcher': 'pathAny', 'argument': 'DBClusters[].Status', 'expected': 'rebooting', 'state': 'failure'},
+                {'matcher': 'pathAny', 'argument': 'DBClusters[].Status', 'expected': 'resetting-master-credentials', 'state': 'failure'},
+            ],
+        },
+    },
+}
+
+def get_cluster_waiter(client, waiter_name):
+    return botocore.waiter.create_waiter_with_client(waiter_name, botocore.waiter.WaiterModel(CLUSTER_WAITERS), client)
+
+# Coerce describe_db_clusters output and module input to comparable values
+CLUSTER_ARG_NORMALIZERS = dict(
+    AvailabilityZones=set,
+    EngineVersion=str,
+    Port=int,
+    VpcSecurityGroupIds=set,
+)
+
+def normalize_cluster_arg(opt, val):
+    if val is None or opt not in CLUSTER_ARG_NORMALIZERS:
+        return val
+    return CLUSTER_ARG_NORMALIZERS[opt](val)
+
+def waiter_config(**params):
+    # Never sleep longer than the whole wait_timeout between two polls
+    delay = max(1, min(params['wait_delay'], params['wait_timeout']))
+    max_attempts = params['wait_max_attempts']
+    if max_attempts is None:
+        max_attempts = max(1, params['wait_timeout'] // delay)
+    return {'Delay': delay, 'MaxAttempts': max_attempts}
+
+def describe_cluster(client, cluster_id, check_cluster=None):
+    # Reuse a response already fetched (e.g. by a waiter) instead of calling the API again
+    if check_cluster is None:
+        try:
+            check_cluster = client.describe_db_clusters(DBClusterIdentifier=cluster_id)
+        except botocore.exceptions.ClientError:
+            return None
+    if 'DBClusters' in check_cluster and len(check_cluster['DBClusters']) == 1:
+        return check_cluster['DBClusters'][0]
+    return None
+
+def wait_cluster_available(module, client, **params):
+    waiter = get_cluster_waiter(client, 'DBClusterAvailable')
+    try:
+        waiter.wait(DBClusterIdentifier=params['cluster_id'],
+                    WaiterConfig=waiter_config(**params))
+    except botocore.exceptions.WaiterError as e:
+        module.fail_json(msg='Failed waiting for DB cluster to become available: %s' % str(e), cluster=describe_cluster(client, params['cluster_id'], e.last_response))
+
+def wait_cluster_pending(client, grace_period, **params):
+    # The cluster keeps reporting available until the modification is picked up,
+    # and the available waiter would accept that on its first, immediate poll
+    pending_timeout = time.time() + grace_period
+    delay = waiter_config(**params)['Delay']
+    while pending_timeout > time.time():
+        cluster = describe_cluster(client, params['cluster_id'])
+        if cluster is None or cluster['Status'] != 'available':
+            return
+        time.sleep(min(delay, max(0, pending_timeout - time.time())))
+
 def update_password(module, client, **params):
     result = client.modify_db_cluster(DBClusterIdentifier=params['cluster_id'], ApplyImmediately=True, MasterUserPassword=params['master_password'])
-    time.sleep(120)
     if params['wait_timeout'] == 0:
         params['wait_timeout'] = 600
-    wait_timeout = time.time() + params['wait_timeout']
-    ready = False
-    while not ready and wait_timeout > time.time():
-        try:
-            check_cluster_start = client.describe_db_clusters(DBClusterIdentifier=params['cluster_id'])
-            for db in check_cluster_start['DBClusters']:
-              status = db['Status']
-            if status == 'available':
-                ready = True
-
-        except (botocore.exceptions.ClientError, boto.exception.BotoServerError) as e:
-          result = e
-
-        if not ready:
-            time.sleep(5)
+    wait_cluster_pending(client, min(120, params['wait_timeout']), **params)
+    wait_cluster_available(module, client, **params)
     module.exit_json(result=result)
 
 def start_cluster(module, client, **params):
     result = client.start_db_cluster(DBClusterIdentifier=params['cluster_id'])
     if params['wait_timeout'] == 0:
         params['wait_timeout'] = 600
-    wait_timeout = time.time() + params['wait_timeout']
-    ready = False
-    while not ready and wait_timeout > time.time():
-        try:
-            check_cluster_start = client.describe_db_clusters(DBClusterIdentifier=params['cluster_id'])
-            for db in check_cluster_start['DBClusters']:
-              status = db['Status']
-            if status == 'available':
-                ready = True
-
-        except (botocore.exceptions.ClientError, boto.exception.BotoServerError) as e:
-          result = e
-
-        if not ready:
-            time.sleep(5)
+    wait_cluster_available(module, client, **params)
     module.exit_json(result=result)
 
 def terminate_cluster(module, client, **params):
-    try:
-        check_cluster = client.describe_db_clusters(DBClusterIdentifier=params['cluster_id'])
-        if 'DBClusters' in check_cluster and len(check_cluster['DBClusters']) == 1:
-            delete_args = dict()
-            delete_args['SkipFinalSnapshot']=True
-            if params['final_db_cluster_snapshot_identifier']:
-                delete_args['SkipFinalSnapshot']=False
-                delete_args['FinalDBSnapshotIdentifier']=params['final_db_cluster_snapshot_identifier']
-            result = client.delete_db_cluster(DBClusterIdentifier=params['cluster_id'], **delete_args)
-            # Isso precisa ser melhorado
-            time.sleep(300)
+    delete_args = dict()
+    delete_args['SkipFinalSnapshot']=True
+    if params['final_db_cluster_snapshot_identifier']:
+        delete_args['SkipFinalSnapshot']=False
+        delete_args['FinalDBSnapshotIdentifier']=params['final_db_cluster_snapshot_identifier']
 
+    # Deleting directly saves a describe call; a missing cluster is already absent
+    try:
+        result = client.delete_db_cluster(DBClusterIdentifier=params['cluster_id'], **delete_args)
     except botocore.exceptions.ClientError as e:
+        code = e.response['Error']['Code']
+        if code == 'InvalidDBClusterStateFault':
+            # A previous run may have left the cluster deleting; just wait for it
+            cluster = describe_cluster(client, params['cluster_id'])
+            if cluster is None or cluster['Status'] != 'deleting':
+                module.fail_json(msg=str(e), cluster=cluster)
+        elif code != 'DBClusterNotFoundFault':
+            module.fail_json(msg=str(e))
         result = True
-        pass
+
+    if not params['wait']:
+        module.exit_json(result=result)
+
+    if params['wait_timeout'] == 0:
+        params['wait_timeout'] = 3600
+    waiter = get_cluster_waiter(client, 'DBClusterDeleted')
+    try:
+        waiter.wait(DBClusterIdentifier=params['cluster_id'],
+                    WaiterConfig=waiter_config(**params))
+    except botocore.exceptions.WaiterError as e:
+        module.fail_json(msg='Failed waiting for DB cluster to be deleted: %s' % str(e), cluster=describe_cluster(client, params['cluster_id'], e.last_response))
     module.exit_json(result=result)
 
 def create_cluster(module, client, **params):
@@ -211,6 +302,7 @@ def create_cluster(module, client, **params):
     if params['tags'] is not None:
         api_args['Tags'] = [dict(Key=k, Value=v) for k, v in params['tags'].items()]
 
+    already_available = False
     try:
         check_cluster = client.describe_db_clusters(DBClusterIdentifier=params['cluster_id'])
 
@@ -225,13 +317,9 @@ def create_cluster(module, client, **params):
         cluster['DBClusterParameterGroupName'] = cluster['DBClusterParameterGroup']
         if params['cluster_parameter_group'] is not None:
           api_args['DBClusterParameterGroupName'] = params['cluster_parameter_group']
-        modify_args = dict()
-        for opt, val in api_args.items():
-            if opt == 'VpcSecurityGroupIds':
-                if sorted([g['VpcSecurityGroupId'] for g in cluster['VpcSecurityGroups']]) != sorted(val):
-                    modify_args[opt] = val
-            elif opt != 'Tags' and cluster[opt] != val:
-                modify_args[opt] = val
+        current = dict(cluster, VpcSecurityGroupIds=[g['VpcSecurityGroupId'] for g in cluster.get('VpcSecurityGroups', [])])
+        modify_args = {opt: val for opt, val in api_args.items()
+                       if opt != 'Tags' and normalize_cluster_arg(opt, current.get(opt)) != normalize_cluster_arg(opt, val)}
 
         if modify_args:
             # Modify existing cluster
@@ -239,6 +327,7 @@ def create_cluster(module, client, **params):
         else:
             # Return existing cluster details verbatim
             result = dict(DBCluster=cluster)
+            already_available = cluster['Status'].lower() == 'available'
 
         if params['wait_timeout'] == 0:
             params['wait_timeout'] = 600
@@ -271,33 +360,13 @@ def create_cluster(module, client, **params):
                     if params['wait_timeout'] == 0:
                         params['wait_timeout'] = 600
 
-            except (botocore.exceptions.ClientError, boto.exception.BotoServerError) as e:
+            except (botocore.exceptions.ClientError, botocore.exceptions.BotoCoreError) as e:
                 module.fail_json(msg=str(e), api_args=api_args)
         else:
             module.fail_json(msg=str(e), api_args=api_args)
 
-    if params['wait']:
-        wait_timeout = time.time() + params['wait_timeout']
-        ready = False
-        while not ready and wait_timeout > time.time():
-            try:
-                check_cluster = client.describe_db_clusters(DBClusterIdentifier=params['cluster_id'])
-                if 'DBClusters' in check_cluster and len(check_cluster['DBClusters']) == 1:
-                    if check_cluster['DBClusters'][0]['Status'].lower() == 'available':
-                        ready = True
-
-            except (botocore.exceptions.ClientError, boto.exception.BotoServerError) as e:
-                pass
-
-            if not ready:
-                time.sleep(5)
-
-        if wait_timeout <= time.time():
-            if 'DBClusters' in check_cluster and len(check_cluster['DBClusters']) == 1:
-                cluster = check_cluster['DBClusters'][0]
-            else:
-                cluster = None
-            module.fail_json(msg='Timed out waiting for DB cluster to become available', cluster=cluster)
+    if params['wait'] and not already_available:
+        wait_cluster_available(module, client, **params)
 
     module.exit_json(result=result)
 
@@ -320,6 +389,8 @@ def main():
         vpc_security_group_ids=dict(type='list', required=False),
         wait=dict(type='bool', required=False, default=False),
         wait_timeout=dict(type='int', required=False, default=0),
+        wait_delay=dict(type='int', required=False, default=15),
+        wait_max_attempts=dict(type='int', required=False),
         final_db_cluster_snapshot_identifier=dict(required=False),
     )
     argument_spec = ec2_argument_spec()
@@ -332,7 +403,9 @@ def main():
 
     try:
         region, ec2_url, aws_connect_kwargs = get_aws_connection_info(module, boto3=True)
-        docdb = boto3_conn(module, conn_type='client', resource='docdb', region=region, endpoint=ec2_url, **aws_connect_kwargs)
+        # Keep the connection alive while the waiters poll and back off adaptively when throttled
+        config = Config(tcp_keepalive=True, retries={'mode': 'adaptive', 'max_attempts': 10})
+        docdb = boto3_conn(module, conn_type='client', resource='docdb', region=region, endpoint=ec2_url, config=config, **aws_connect_kwargs)
     except botocore.exceptions.ClientError as e:
         module.fail_json(msg="Boto3 Client Error - " + str(e))
 
@@ -345,9 +418,5 @@ def main():
     elif module.params.get('state') == 'running':
         start_cluster(module, docdb, **args_dict)
 
-# import module snippets
-from ansible.module_utils.basic import *
-from ansible.module_utils.ec2 import *
-
 if __name__ == '__main__':
     main()
@@ -89,6 +89,18 @@ options:
       - Used when state=present and wait=yes.
     required: false
     default: 1200
+  wait_delay:
+    description:
+      - Number of seconds to wait between polls, when wait=yes
+      - Capped at I(wait_timeout).
+    required: false
+    default: 15
+  wait_max_attempts:
+    description:
+      - Maximum number of polls, when wait=yes
+      - Defaults to I(wait_timeout) divided by I(wait_delay).
+    required: false
+    default: null
 
 author: "Sidnei Weber (@sidneiweber)"
 extends_documentation_fragment:
@@ -108,14 +120,43 @@ EXAMPLES = '''
     state: present
 '''
 
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.ec2 import boto3_conn, ec2_argument_spec, get_aws_connection_info
+
 try:
     import boto3
     import botocore.exceptions
+    from botocore.config import Config
     HAS_BOTO3 = True
 except ImportError:
     HAS_BOTO3 = False
 
-import time
+def waiter_config(**params):
+    # Never sleep longer than the whole wait_timeout between two polls
+    delay = max(1, min(params['wait_delay'], params['wait_timeout']))
+    max_attempts = params['wait_max_attempts']
+    if max_attempts is None:
+        max_attempts = max(1, params['wait_timeout'] // delay)
+    return {'Delay': delay, 'MaxAttempts': max_attempts}
+
+def describe_instance(client, instance_id, check_instance=None):
+    # Reuse a response already fetched (e.g. by a waiter) instead of calling the API again
+    if check_instance is None:
+        try:
+            check_instance = client.describe_db_instances(DBInstanceIdentifier=instance_id)
+        except botocore.exceptions.ClientError:
+            return None
+    if 'DBInstances' in check_instance and len(check_instance['DBInstances']) == 1:
+        return check_instance['DBInstances'][0]
+    return None
+
+def wait_instance_available(module, client, **params):
+    waiter = client.get_waiter('db_instance_available')
+    try:
+        waiter.wait(DBInstanceIdentifier=params['instance_id'],
+                    WaiterConfig=waiter_config(**params))
+    except botocore.exceptions.WaiterError as e:
+        module.fail_json(msg='Failed waiting for DB instance to become available: %s' % str(e), instance=describe_instance(client, params['instance_id'], e.last_response))
 
 def terminate_db_instance(module, client, **params):
     try:
@@ -143,9 +184,8 @@ def create_db_instance(module, client, **params):
     if params['preferred_maintenance_window'] is not None:
         api_args['PreferredMaintenanceWindow'] = params['preferred_maintenance_window']
 
-    tags = None
-    if params['tags'] is not None:
-        tags = [{'Key': k, 'Value': v} for k, v in params['tags'].items()]
+    desired_tags = params['tags'] or {}
+    tags = [{'Key': k, 'Value': v} for k, v in desired_tags.items()]
 
     try:
         check_instance = client.describe_db_instances(DBInstanceIdentifier=params['instance_id'])
@@ -164,13 +204,16 @@ def create_db_instance(module, client, **params):
             # Return existing instance details verbatim
             result = dict(DBInstance=instance)
 
-        # Set instance tags
-        tags_result = client.list_tags_for_resource(ResourceName=check_instance['DBInstances'][0]['DBInstanceArn'])
-        if 'TagList' in tags_result:
-            client.remove_tags_from_resource(ResourceName=check_instance['DBInstances'][0]['DBInstanceArn'], TagKeys=[t['Key'] for t in tags_result['TagList']])
-            if tags is not None:
-                api_args['Tags'] = tags
-                client.add_tags_to_resource(ResourceName=check_instance['DBInstances'][0]['DBInstanceArn'], Tags=tags)
+        # Set instance tags, only touching the keys that differ
+        tags_result = client.list_tags_for_resource(ResourceName=instance['DBInstanceArn'])
+        current_tags = {t['Key']: t['Value'] for t in tags_result.get('TagList', [])}
+        if current_tags != desired_tags:
+            remove_keys = [k for k in current_tags if k not in desired_tags]
+            if remove_keys:
+                client.remove_tags_from_resource(ResourceName=instance['DBInstanceArn'], TagKeys=remove_keys)
+            add_tags = [{'Key': k, 'Value': v} for k, v in desired_tags.items() if current_tags.get(k) != v]
+            if add_tags:
+                client.add_tags_to_resource(ResourceName=instance['DBInstanceArn'], Tags=add_tags)
 
     except botocore.exceptions.ClientError as e:
         if e.response['Error']['Code'] == 'DBInstanceNotFound':
@@ -180,42 +223,21 @@ def create_db_instance(module, client, **params):
                 api_args['DBClusterIdentifier'] = params['cluster_id']
             if params['engine'] is not None:
                 api_args['Engine'] = params['engine']
-            if tags is not None:
-                api_args['Tags'] = tags
+            api_args['Tags'] = tags
 
             try:
                 result = client.create_db_instance(**api_args)
-            except (botocore.exceptions.ClientError, boto.exception.BotoServerError) as e:
+            except (botocore.exceptions.ClientError, botocore.exceptions.BotoCoreError) as e:
                 module.fail_json(msg=str(e), api_args=api_args)
 
         else:
             module.fail_json(msg=str(e), api_args=api_args)
 
-    except boto.exception.BotoServerError as e:
+    except botocore.exceptions.BotoCoreError as e:
         module.fail_json(msg=str(e), api_args=api_args)
 
     if params['wait']:
-        wait_timeout = time.time() + params['wait_timeout']
-        ready = False
-        while not ready and wait_timeout > time.time():
-            try:
-                check_instance = client.describe_db_instances(DBInstanceIdentifier=params['instance_id'])
-                if 'DBInstances' in check_instance and len(check_instance['DBInstances']) == 1:
-                    if check_instance['DBInstances'][0]['DBInstanceStatus'].lower() == 'available':
-                        ready = True
-
-            except (botocore.exceptions.ClientError, boto.exception.BotoServerError) as e:
-                pass
-
-            if not ready:
-                time.sleep(5)
-
-        if wait_timeout <= time.time():
-            if 'DBInstances' in check_instance and len(check_instance['DBInstances']) == 1:
-                instance = check_instance['DBInstances'][0]
-            else:
-                instance = None
-            module.fail_json(msg='Timed out waiting for DB instance to become available', instance=instance)
+        wait_instance_available(module, client, **params)
 
     module.exit_json(result=result)
 
@@ -233,6 +255,8 @@ def main():
         tags = dict(required=False, type='dict', default={}),
         wait = dict(required=False, type='bool', default=False),
         wait_timeout = dict(required=False, type='int', default=1200),
+        wait_delay = dict(required=False, type='int', default=15),
+        wait_max_attempts = dict(required=False, type='int'),
     )
     argument_spec = ec2_argument_spec()
     argument_spec.update(module_args)
@@ -246,7 +270,9 @@ def main():
 
     try:
         region, ec2_url, aws_connect_kwargs = get_aws_connection_info(module, boto3=True)
-        docdb = boto3_conn(module, conn_type='client', resource='docdb', region=region, endpoint=ec2_url, **aws_connect_kwargs)
+        # Keep the connection alive while the waiters poll and back off adaptively when throttled
+        config = Config(tcp_keepalive=True, retries={'mode': 'adaptive', 'max_attempts': 10})
+        docdb = boto3_conn(module, conn_type='client', resource='docdb', region=region, endpoint=ec2_url, config=config, **aws_connect_kwargs)
 
     except botocore.exceptions.ClientError as e:
         module.fail_json(msg="Boto3 Client Error - " + str(e))
@@ -256,9 +282,5 @@ def main():
     elif module.params.get('state') == 'absent':
         terminate_db_instance(module, docdb, **args_dict)
 
-# import module snippets
-from ansible.module_utils.basic import *
-from ansible.module_utils.ec2 import *
-
 if __name__ == '__main__':
     main()